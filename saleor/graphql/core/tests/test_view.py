@@ -289,3 +289,35 @@ def test_example_query(api_client, product):
     response = api_client.post_graphql(EXAMPLE_QUERY)
     content = get_graphql_content(response)
     assert content["data"]["products"]["edges"][0]["node"]["name"] == product.name
+
+
+def test_execute_graphql_matches_post_graphql_for_anonymous_query(api_client, product):
+    content = api_client.execute_graphql(EXAMPLE_QUERY)
+    response = api_client.post_graphql(EXAMPLE_QUERY)
+    assert content == get_graphql_content(response)
+    assert content["data"]["products"]["edges"][0]["node"]["name"] == product.name
+
+
+QUERY_STAFF_USERS = """
+    query {
+        staffUsers(first: 10) {
+            edges {
+                node {
+                    email
+                }
+            }
+        }
+    }
+"""
+
+
+def test_execute_graphql_matches_post_graphql_for_permissioned_query(
+    staff_api_client, staff_user, permission_manage_staff
+):
+    content = staff_api_client.execute_graphql(
+        QUERY_STAFF_USERS, permissions=[permission_manage_staff]
+    )
+    response = staff_api_client.post_graphql(QUERY_STAFF_USERS)
+    assert content == get_graphql_content(response)
+    emails = [edge["node"]["email"] for edge in content["data"]["staffUsers"]["edges"]]
+    assert staff_user.email in emails
@@ -1,10 +1,9 @@
-from unittest.mock import ANY, patch
-from uuid import uuid4
+import itertools
+from unittest.mock import ANY
 
-import graphene
 import pytest
+from django.db.models import Max
 from measurement.measures import Weight
-from prices import Money, TaxedMoney
 
 from ....core.weight import WeightUnits
 from ....order import OrderStatus
@@ -15,13 +14,48 @@ from ....product.utils.attributes import associate_attribute_values_to_instance
 from ....warehouse.error_codes import StockErrorCode
 from ....warehouse.models import Stock, Warehouse
 from ...core.enums import WeightUnitsEnum
-from ...tests.utils import assert_negative_positive_decimal_value, get_graphql_content
+from ...tests.utils import (
+    assert_negative_positive_decimal_value,
+    get_graphql_content,
+    to_global_id,
+)
 
+pytestmark = pytest.mark.usefixtures("graphql_cached_backend")
 
-def test_fetch_variant(
-    staff_api_client, product, permission_manage_products, site_settings
-):
-    query = """
+_sku_counter = itertools.count()
+
+
+def _get_unique_sku():
+    """Return a SKU that isn't used by any other variant created in this module."""
+    return f"sku-{next(_sku_counter)}"
+
+
+@pytest.fixture
+def staff_api_client_with_products_perm(staff_api_client, permission_manage_products):
+    """Return a staff API client whose user can already manage products.
+
+    Unlike passing `permissions` to `post_graphql`, it doesn't send the query
+    once more beforehand to check that it's rejected without the permission.
+    """
+    staff_api_client.user.user_permissions.add(permission_manage_products)
+    return staff_api_client
+
+
+@pytest.fixture
+def updated_products(monkeypatch):
+    """Collect the products passed to the `product_updated` plugin hook."""
+    products = []
+
+    def product_updated(_manager, product):
+        products.append(product)
+
+    monkeypatch.setattr(
+        "saleor.plugins.manager.PluginsManager.product_updated", product_updated
+    )
+    return products
+
+
+QUERY_FETCH_VARIANT = """
     query ProductVariantDetails($id: ID!, $countyCode: CountryCode) {
         productVariant(id: $id) {
             id
@@ -66,31 +100,81 @@ def test_fetch_variant(
             }
         }
     }
-    """
+"""
+
+
+def test_fetch_variant(staff_api_client_with_products_perm, product, site_settings):
     # given
-    variant = product.variants.first()
+    variant = product.variants.prefetch_related("stocks").first()
     variant.weight = Weight(kg=10)
     variant.save(update_fields=["weight"])
 
     site_settings.default_weight_unit = WeightUnits.GRAM
     site_settings.save(update_fields=["default_weight_unit"])
 
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
     variables = {"id": variant_id, "countyCode": "EU"}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
 
     # when
-    response = staff_api_client.post_graphql(query, variables)
+    content = staff_api_client_with_products_perm.execute_graphql(
+        QUERY_FETCH_VARIANT, variables
+    )
 
     # then
-    content = get_graphql_content(response)
     data = content["data"]["productVariant"]
     assert data["name"] == variant.name
-    assert len(data["stocks"]) == variant.stocks.count()
+    assert len(data["stocks"]) == len(variant.stocks.all())
     assert data["weight"]["value"] == 10000
     assert data["weight"]["unit"] == WeightUnitsEnum.G.name
 
 
+def test_fetch_variant_number_of_queries_does_not_depend_on_related_objects(
+    staff_api_client_with_products_perm,
+    product,
+    color_attribute,
+    warehouses,
+    capture_queries,
+    django_assert_max_num_queries,
+):
+    # given
+    variant = product.variants.first()
+    variables = {"id": to_global_id("ProductVariant", variant.pk)}
+
+    # The first request warms up process-wide caches, e.g. the current site.
+    staff_api_client_with_products_perm.execute_graphql(QUERY_FETCH_VARIANT, variables)
+
+    # the bound includes the authentication and permission checks of the request
+    with django_assert_max_num_queries(20) as queries_for_single_related_object:
+        staff_api_client_with_products_perm.execute_graphql(
+            QUERY_FETCH_VARIANT, variables
+        )
+
+    product.product_type.variant_attributes.add(color_attribute)
+    associate_attribute_values_to_instance(
+        variant, color_attribute, color_attribute.values.first()
+    )
+    Stock.objects.bulk_create(
+        [
+            Stock(warehouse=warehouse, product_variant=variant, quantity=5)
+            for warehouse in warehouses
+        ]
+    )
+
+    # when
+    with capture_queries() as queries_for_many_related_objects:
+        content = staff_api_client_with_products_perm.execute_graphql(
+            QUERY_FETCH_VARIANT, variables
+        )
+
+    # then
+    data = content["data"]["productVariant"]
+    assert len(data["stocks"]) == 3
+    assert len(data["attributes"]) == 2
+    assert len(queries_for_many_related_objects) == len(
+        queries_for_single_related_object
+    )
+
+
 CREATE_VARIANT_MUTATION = """
       mutation createVariant (
             $productId: ID!,
@@ -156,32 +240,24 @@ CREATE_VARIANT_MUTATION = """
 """
 
 
-@patch("saleor.plugins.manager.PluginsManager.product_updated")
 def test_create_variant(
-    updated_webhook_mock,
     staff_api_client,
+    updated_products,
     product,
-    product_type,
+    size_attribute,
     permission_manage_products,
     warehouse,
 ):
     query = CREATE_VARIANT_MUTATION
-    product_id = graphene.Node.to_global_id("Product", product.pk)
+    product_id = to_global_id("Product", product.pk)
     sku = "1"
     price = 1.32
     cost_price = 3.22
     weight = 10.22
-    variant_slug = product_type.variant_attributes.first().slug
-    variant_id = graphene.Node.to_global_id(
-        "Attribute", product_type.variant_attributes.first().pk
-    )
+    variant_slug = size_attribute.slug
+    variant_id = to_global_id("Attribute", size_attribute.pk)
     variant_value = "test-value"
-    stocks = [
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.pk),
-            "quantity": 20,
-        }
-    ]
+    stocks = [{"warehouse": to_global_id("Warehouse", warehouse.pk), "quantity": 20}]
 
     variables = {
         "productId": product_id,
@@ -193,10 +269,9 @@ def test_create_variant(
         "attributes": [{"id": variant_id, "values": [variant_value]}],
         "trackInventory": True,
     }
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         query, variables, permissions=[permission_manage_products]
-    )
-    content = get_graphql_content(response)["data"]["productVariantCreate"]
+    )["data"]["productVariantCreate"]
     assert not content["productErrors"]
     data = content["productVariant"]
     assert data["name"] == variant_value
@@ -210,25 +285,21 @@ def test_create_variant(
     assert len(data["stocks"]) == 1
     assert data["stocks"][0]["quantity"] == stocks[0]["quantity"]
     assert data["stocks"][0]["warehouse"]["slug"] == warehouse.slug
-    updated_webhook_mock.assert_called_once_with(product)
+    assert updated_products == [product]
 
 
 def test_create_product_variant_without_price(
-    staff_api_client, product, product_type, permission_manage_products
+    staff_api_client_with_products_perm, product, size_attribute
 ):
     query = CREATE_VARIANT_MUTATION
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    attr_id = graphene.Node.to_global_id(
-        "Attribute", product_type.variant_attributes.first().pk
-    )
+    product_id = to_global_id("Product", product.pk)
+    attr_id = to_global_id("Attribute", size_attribute.pk)
     attr_value = "test-value"
     variables = {
         "productId": product_id,
         "attributes": [{"id": attr_id, "values": [attr_value]}],
     }
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
+    response = staff_api_client_with_products_perm.post_graphql(query, variables)
     content = get_graphql_content(response)
     data = content["data"]["productVariantCreate"]
     error = data["productErrors"][0]
@@ -237,14 +308,12 @@ def test_create_product_variant_without_price(
 
 
 def test_create_product_variant_with_negative_weight(
-    staff_api_client, product, product_type, permission_manage_products
+    staff_api_client_with_products_perm, product, size_attribute
 ):
     query = CREATE_VARIANT_MUTATION
-    product_id = graphene.Node.to_global_id("Product", product.pk)
+    product_id = to_global_id("Product", product.pk)
 
-    variant_id = graphene.Node.to_global_id(
-        "Attribute", product_type.variant_attributes.first().pk
-    )
+    variant_id = to_global_id("Attribute", size_attribute.pk)
     variant_value = "test-value"
 
     variables = {
@@ -252,10 +321,7 @@ def test_create_product_variant_with_negative_weight(
         "weight": -1,
         "attributes": [{"id": variant_id, "values": [variant_value]}],
     }
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
-    content = get_graphql_content(response)
+    content = staff_api_client_with_products_perm.execute_graphql(query, variables)
     data = content["data"]["productVariantCreate"]
     error = data["productErrors"][0]
     assert error["field"] == "weight"
@@ -263,11 +329,11 @@ def test_create_product_variant_with_negative_weight(
 
 
 def test_create_product_variant_without_attributes(
-    staff_api_client, product, permission_manage_products
+    staff_api_client_with_products_perm, product
 ):
     # given
     query = CREATE_VARIANT_MUTATION
-    product_id = graphene.Node.to_global_id("Product", product.pk)
+    product_id = to_global_id("Product", product.pk)
     variables = {
         "productId": product_id,
         "sku": "test-sku",
@@ -276,9 +342,7 @@ def test_create_product_variant_without_attributes(
     }
 
     # when
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
+    response = staff_api_client_with_products_perm.post_graphql(query, variables)
 
     # then
     content = get_graphql_content(response)
@@ -290,14 +354,16 @@ def test_create_product_variant_without_attributes(
 
 
 def test_create_product_variant_not_all_attributes(
-    staff_api_client, product, product_type, color_attribute, permission_manage_products
+    staff_api_client_with_products_perm,
+    product,
+    product_type,
+    size_attribute,
+    color_attribute,
 ):
     query = CREATE_VARIANT_MUTATION
-    product_id = graphene.Node.to_global_id("Product", product.pk)
+    product_id = to_global_id("Product", product.pk)
     sku = "1"
-    variant_id = graphene.Node.to_global_id(
-        "Attribute", product_type.variant_attributes.first().pk
-    )
+    variant_id = to_global_id("Attribute", size_attribute.pk)
     variant_value = "test-value"
     product_type.variant_attributes.add(color_attribute)
 
@@ -307,10 +373,7 @@ def test_create_product_variant_not_all_attributes(
         "sku": sku,
         "attributes": [{"id": variant_id, "values": [variant_value]}],
     }
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
-    content = get_graphql_content(response)
+    content = staff_api_client_with_products_perm.execute_graphql(query, variables)
     assert content["data"]["productVariantCreate"]["productErrors"]
     assert content["data"]["productVariantCreate"]["productErrors"][0] == {
         "field": "attributes",
@@ -322,14 +385,12 @@ def test_create_product_variant_not_all_attributes(
 
 
 def test_create_product_variant_too_many_places_in_cost_price(
-    staff_api_client, product, product_type, permission_manage_products
+    staff_api_client_with_products_perm, product, size_attribute
 ):
     query = CREATE_VARIANT_MUTATION
-    product_id = graphene.Node.to_global_id("Product", product.pk)
+    product_id = to_global_id("Product", product.pk)
 
-    variant_id = graphene.Node.to_global_id(
-        "Attribute", product_type.variant_attributes.first().pk
-    )
+    variant_id = to_global_id("Attribute", size_attribute.pk)
     variant_value = "test-value"
 
     variables = {
@@ -338,9 +399,7 @@ def test_create_product_variant_too_many_places_in_cost_price(
         "attributes": [{"id": variant_id, "values": [variant_value]}],
         "costPrice": 1.40001,
     }
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
+    response = staff_api_client_with_products_perm.post_graphql(query, variables)
     content = get_graphql_content(response)
     data = content["data"]["productVariantCreate"]
     error = data["productErrors"][0]
@@ -349,18 +408,17 @@ def test_create_product_variant_too_many_places_in_cost_price(
 
 
 def test_create_product_variant_duplicated_attributes(
-    staff_api_client,
+    staff_api_client_with_products_perm,
     product_with_variant_with_two_attributes,
     color_attribute,
     size_attribute,
-    permission_manage_products,
 ):
     query = CREATE_VARIANT_MUTATION
     product = product_with_variant_with_two_attributes
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    color_attribute_id = graphene.Node.to_global_id("Attribute", color_attribute.id)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.id)
-    sku = str(uuid4())[:12]
+    product_id = to_global_id("Product", product.pk)
+    color_attribute_id = to_global_id("Attribute", color_attribute.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
+    sku = _get_unique_sku()
     variables = {
         "productId": product_id,
         "price": 15,
@@ -370,10 +428,7 @@ def test_create_product_variant_duplicated_attributes(
             {"id": size_attribute_id, "values": ["small"]},
         ],
     }
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
-    content = get_graphql_content(response)
+    content = staff_api_client_with_products_perm.execute_graphql(query, variables)
     assert content["data"]["productVariantCreate"]["productErrors"]
     assert content["data"]["productVariantCreate"]["productErrors"][0] == {
         "field": "attributes",
@@ -385,16 +440,15 @@ def test_create_product_variant_duplicated_attributes(
 
 
 def test_create_variant_invalid_variant_attributes(
-    staff_api_client,
+    staff_api_client_with_products_perm,
     product,
     product_type,
-    permission_manage_products,
     warehouse,
     color_attribute,
     weight_attribute,
 ):
     query = CREATE_VARIANT_MUTATION
-    product_id = graphene.Node.to_global_id("Product", product.pk)
+    product_id = to_global_id("Product", product.pk)
     sku = "1"
     price = 1.32
     cost_price = 3.22
@@ -403,23 +457,18 @@ def test_create_variant_invalid_variant_attributes(
     # Default attribute defined in product_type fixture
     size_attribute = product_type.variant_attributes.get(name="Size")
     size_value_slug = size_attribute.values.first().slug
-    size_attr_id = graphene.Node.to_global_id("Attribute", size_attribute.id)
+    size_attr_id = to_global_id("Attribute", size_attribute.pk)
 
     # Add second attribute
     product_type.variant_attributes.add(color_attribute)
-    color_attr_id = graphene.Node.to_global_id("Attribute", color_attribute.id)
+    color_attr_id = to_global_id("Attribute", color_attribute.pk)
     non_existent_attr_value = "The cake is a lie"
 
     # Add third attribute
     product_type.variant_attributes.add(weight_attribute)
-    weight_attr_id = graphene.Node.to_global_id("Attribute", weight_attribute.id)
+    weight_attr_id = to_global_id("Attribute", weight_attribute.pk)
 
-    stocks = [
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.pk),
-            "quantity": 20,
-        }
-    ]
+    stocks = [{"warehouse": to_global_id("Warehouse", warehouse.pk), "quantity": 20}]
 
     variables = {
         "productId": product_id,
@@ -435,9 +484,7 @@ def test_create_variant_invalid_variant_attributes(
         ],
         "trackInventory": True,
     }
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
+    response = staff_api_client_with_products_perm.post_graphql(query, variables)
     content = get_graphql_content(response)
 
     data = content["data"]["productVariantCreate"]
@@ -446,28 +493,15 @@ def test_create_variant_invalid_variant_attributes(
     assert not data["productVariant"]
     assert len(errors) == 2
 
-    expected_errors = [
-        {
-            "attributes": [color_attr_id, weight_attr_id],
-            "code": ProductErrorCode.REQUIRED.name,
-            "field": "attributes",
-            "message": ANY,
-        },
-        {
-            "attributes": [size_attr_id],
-            "code": ProductErrorCode.INVALID.name,
-            "field": "attributes",
-            "message": ANY,
-        },
-    ]
-    for error in expected_errors:
-        assert error in errors
+    assert {
+        (error["field"], error["code"], tuple(error["attributes"])) for error in errors
+    } == {
+        ("attributes", ProductErrorCode.REQUIRED.name, (color_attr_id, weight_attr_id)),
+        ("attributes", ProductErrorCode.INVALID.name, (size_attr_id,)),
+    }
 
 
-def test_create_product_variant_update_with_new_attributes(
-    staff_api_client, permission_manage_products, product, size_attribute
-):
-    query = """
+UPDATE_VARIANT_WITH_NEW_ATTRIBUTES_MUTATION = """
         mutation VariantUpdate(
           $id: ID!
           $attributes: [AttributeValueInput]
@@ -510,12 +544,14 @@ def test_create_product_variant_update_with_new_attributes(
             }
           }
         }
-    """
+"""
 
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
-    variant_id = graphene.Node.to_global_id(
-        "ProductVariant", product.variants.first().pk
-    )
+
+def test_create_product_variant_update_with_new_attributes(
+    staff_api_client_with_products_perm, product, size_attribute
+):
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
+    variant_id = to_global_id("ProductVariant", product.variants.first().pk)
 
     variables = {
         "attributes": [{"id": size_attribute_id, "values": ["XXXL"]}],
@@ -526,10 +562,8 @@ def test_create_product_variant_update_with_new_attributes(
         "trackInventory": True,
     }
 
-    data = get_graphql_content(
-        staff_api_client.post_graphql(
-            query, variables, permissions=[permission_manage_products]
-        )
+    data = staff_api_client_with_products_perm.execute_graphql(
+        UPDATE_VARIANT_WITH_NEW_ATTRIBUTES_MUTATION, variables
     )["data"]["productVariantUpdate"]
     assert not data["errors"]
     assert data["productVariant"]["id"] == variant_id
@@ -539,15 +573,7 @@ def test_create_product_variant_update_with_new_attributes(
     assert attributes[0]["attribute"]["id"] == size_attribute_id
 
 
-@patch("saleor.plugins.manager.PluginsManager.product_updated")
-def test_update_product_variant(
-    updated_webhook_mock,
-    staff_api_client,
-    product,
-    size_attribute,
-    permission_manage_products,
-):
-    query = """
+UPDATE_VARIANT_MUTATION = """
         mutation updateVariant (
             $id: ID!,
             $sku: String!,
@@ -580,10 +606,19 @@ def test_update_product_variant(
                 }
             }
 
-    """
+"""
+
+
+def test_update_product_variant(
+    staff_api_client,
+    updated_products,
+    product,
+    size_attribute,
+    permission_manage_products,
+):
     variant = product.variants.first()
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
+    attribute_id = to_global_id("Attribute", size_attribute.pk)
     sku = "test sku"
     cost_price = 3.3
     price = 15
@@ -597,23 +632,19 @@ def test_update_product_variant(
         "attributes": [{"id": attribute_id, "values": ["S"]}],
     }
 
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
+    content = staff_api_client.execute_graphql(
+        UPDATE_VARIANT_MUTATION, variables, permissions=[permission_manage_products]
     )
     variant.refresh_from_db()
-    content = get_graphql_content(response)
     data = content["data"]["productVariantUpdate"]["productVariant"]
     assert data["name"] == variant.name
     assert data["costPrice"]["amount"] == cost_price
     assert data["price"]["amount"] == price
     assert data["sku"] == sku
-    updated_webhook_mock.assert_called_once_with(product)
+    assert updated_products == [product]
 
 
-def test_update_product_variant_with_negative_weight(
-    staff_api_client, product, permission_manage_products
-):
-    query = """
+UPDATE_VARIANT_WEIGHT_AND_PRICE_MUTATION = """
         mutation updateVariant (
             $id: ID!,
             $price: PositiveDecimal,
@@ -636,28 +667,26 @@ def test_update_product_variant_with_negative_weight(
                 }
             }
         }
-    """
+"""
+
+
+def test_update_product_variant_with_negative_weight(
+    staff_api_client_with_products_perm, product
+):
     variant = product.variants.first()
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
     variables = {"id": variant_id, "weight": -1, "price": 15}
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
+    content = staff_api_client_with_products_perm.execute_graphql(
+        UPDATE_VARIANT_WEIGHT_AND_PRICE_MUTATION, variables
     )
     variant.refresh_from_db()
-    content = get_graphql_content(response)
     data = content["data"]["productVariantUpdate"]
     error = data["productErrors"][0]
     assert error["field"] == "weight"
     assert error["code"] == ProductErrorCode.INVALID.name
 
 
-def test_update_product_variant_unset_cost_price(
-    staff_api_client, product, size_attribute, permission_manage_products
-):
-    """Ensure setting nullable amounts to null is properly handled
-    (setting the amount to none) and doesn't override the currency.
-    """
-    query = """
+UPDATE_VARIANT_COST_PRICE_MUTATION = """
         mutation updateVariant (
             $id: ID!,
             $sku: String!,
@@ -685,10 +714,18 @@ def test_update_product_variant_unset_cost_price(
                 }
             }
 
+"""
+
+
+def test_update_product_variant_unset_cost_price(
+    staff_api_client_with_products_perm, product, size_attribute
+):
+    """Ensure setting nullable amounts to null is properly handled
+    (setting the amount to none) and doesn't override the currency.
     """
     variant = product.variants.first()
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
+    attribute_id = to_global_id("Attribute", size_attribute.pk)
     sku = variant.sku
 
     variables = {
@@ -699,8 +736,8 @@ def test_update_product_variant_unset_cost_price(
         "attributes": [{"id": attribute_id, "values": ["S"]}],
     }
 
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
+    response = staff_api_client_with_products_perm.post_graphql(
+        UPDATE_VARIANT_COST_PRICE_MUTATION, variables
     )
     variant.refresh_from_db()
 
@@ -712,10 +749,7 @@ def test_update_product_variant_unset_cost_price(
     assert data["costPrice"] is None
 
 
-def test_update_product_variant_invalid_price(
-    staff_api_client, product, size_attribute, permission_manage_products
-):
-    query = """
+UPDATE_VARIANT_PRICE_MUTATION = """
         mutation updateVariant(
             $id: ID!
             $sku: String!
@@ -739,10 +773,15 @@ def test_update_product_variant_invalid_price(
                 }
             }
         }
-    """
+"""
+
+
+def test_update_product_variant_invalid_price(
+    staff_api_client_with_products_perm, product, size_attribute
+):
     variant = product.variants.first()
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
+    attribute_id = to_global_id("Attribute", size_attribute.pk)
 
     variables = {
         "id": variant_id,
@@ -752,8 +791,8 @@ def test_update_product_variant_invalid_price(
         "attributes": [{"id": attribute_id, "values": ["S"]}],
     }
 
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
+    response = staff_api_client_with_products_perm.post_graphql(
+        UPDATE_VARIANT_PRICE_MUTATION, variables
     )
     content = get_graphql_content(response)
 
@@ -789,37 +828,13 @@ QUERY_UPDATE_VARIANT_ATTRIBUTES = """
 
 
 def test_update_product_variant_with_too_many_decimal_values_in_price(
-    staff_api_client, product, permission_manage_products
+    staff_api_client_with_products_perm, product
 ):
-    query = """
-        mutation updateVariant (
-            $id: ID!,
-            $price: PositiveDecimal,
-            $weight: WeightScalar
-        ) {
-            productVariantUpdate(
-                id: $id,
-                input: {
-                    weight: $weight,
-                    price: $price
-                }
-            ){
-                productVariant {
-                    name
-                }
-                productErrors {
-                    field
-                    message
-                    code
-                }
-            }
-        }
-    """
     variant = product.variants.first()
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
     variables = {"id": variant_id, "weight": 1, "price": 15.234}
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
+    response = staff_api_client_with_products_perm.post_graphql(
+        UPDATE_VARIANT_WEIGHT_AND_PRICE_MUTATION, variables
     )
     variant.refresh_from_db()
     content = get_graphql_content(response)
@@ -830,7 +845,11 @@ def test_update_product_variant_with_too_many_decimal_values_in_price(
 
 
 def test_update_product_variant_not_all_attributes(
-    staff_api_client, product, product_type, color_attribute, permission_manage_products
+    staff_api_client_with_products_perm,
+    product,
+    product_type,
+    size_attribute,
+    color_attribute,
 ):
     """Ensures updating a variant with missing attributes (all attributes must
     be provided) raises an error. We expect the color attribute
@@ -838,11 +857,9 @@ def test_update_product_variant_not_all_attributes(
 
     query = QUERY_UPDATE_VARIANT_ATTRIBUTES
     variant = product.variants.first()
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
     sku = "test sku"
-    attr_id = graphene.Node.to_global_id(
-        "Attribute", product_type.variant_attributes.first().id
-    )
+    attr_id = to_global_id("Attribute", size_attribute.pk)
     variant_value = "test-value"
     product_type.variant_attributes.add(color_attribute)
 
@@ -853,11 +870,8 @@ def test_update_product_variant_not_all_attributes(
         "attributes": [{"id": attr_id, "values": [variant_value]}],
     }
 
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
+    content = staff_api_client_with_products_perm.execute_graphql(query, variables)
     variant.refresh_from_db()
-    content = get_graphql_content(response)
     assert len(content["data"]["productVariantUpdate"]["errors"]) == 1
     assert content["data"]["productVariantUpdate"]["errors"][0] == {
         "field": "attributes",
@@ -866,81 +880,47 @@ def test_update_product_variant_not_all_attributes(
     assert not product.variants.filter(sku=sku).exists()
 
 
-def test_update_product_variant_with_current_attribute(
-    staff_api_client,
-    product_with_variant_with_two_attributes,
-    color_attribute,
-    size_attribute,
-    permission_manage_products,
-):
-    product = product_with_variant_with_two_attributes
-    variant = product.variants.first()
-    sku = str(uuid4())[:12]
-    assert not variant.sku == sku
-    assert variant.attributes.first().values.first().slug == "red"
-    assert variant.attributes.last().values.first().slug == "small"
-
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    color_attribute_id = graphene.Node.to_global_id("Attribute", color_attribute.pk)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
-
-    variables = {
-        "id": variant_id,
-        "sku": sku,
-        "price": 15,
-        "attributes": [
-            {"id": color_attribute_id, "values": ["red"]},
-            {"id": size_attribute_id, "values": ["small"]},
-        ],
-    }
-
-    response = staff_api_client.post_graphql(
-        QUERY_UPDATE_VARIANT_ATTRIBUTES,
-        variables,
-        permissions=[permission_manage_products],
-    )
-    content = get_graphql_content(response)
-
-    data = content["data"]["productVariantUpdate"]
-    assert not data["errors"]
-    variant.refresh_from_db()
-    assert variant.sku == sku
-    assert variant.attributes.first().values.first().slug == "red"
-    assert variant.attributes.last().values.first().slug == "small"
+def _get_attribute_value_slugs(variant):
+    """Return the slug of the first value of each variant attribute."""
+    attributes = variant.attributes.order_by("pk").prefetch_related("values")
+    return [attribute.values.all()[0].slug for attribute in attributes]
 
 
-def test_update_product_variant_with_new_attribute(
-    staff_api_client,
+@pytest.mark.parametrize(
+    "color, size",
+    [("red", "small"), ("red", "big")],
+    ids=["current_attribute", "new_attribute"],
+)
+def test_update_product_variant_with_attributes(
+    staff_api_client_with_products_perm,
     product_with_variant_with_two_attributes,
     color_attribute,
     size_attribute,
-    permission_manage_products,
+    color,
+    size,
 ):
     product = product_with_variant_with_two_attributes
     variant = product.variants.first()
-    sku = str(uuid4())[:12]
+    sku = _get_unique_sku()
     assert not variant.sku == sku
-    assert variant.attributes.first().values.first().slug == "red"
-    assert variant.attributes.last().values.first().slug == "small"
+    assert _get_attribute_value_slugs(variant) == ["red", "small"]
 
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    color_attribute_id = graphene.Node.to_global_id("Attribute", color_attribute.pk)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
+    color_attribute_id = to_global_id("Attribute", color_attribute.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
 
     variables = {
         "id": variant_id,
         "sku": sku,
         "price": 15,
         "attributes": [
-            {"id": color_attribute_id, "values": ["red"]},
-            {"id": size_attribute_id, "values": ["big"]},
+            {"id": color_attribute_id, "values": [color]},
+            {"id": size_attribute_id, "values": [size]},
         ],
     }
 
-    response = staff_api_client.post_graphql(
-        QUERY_UPDATE_VARIANT_ATTRIBUTES,
-        variables,
-        permissions=[permission_manage_products],
+    response = staff_api_client_with_products_perm.post_graphql(
+        QUERY_UPDATE_VARIANT_ATTRIBUTES, variables
     )
     content = get_graphql_content(response)
 
@@ -948,23 +928,21 @@ def test_update_product_variant_with_new_attribute(
     assert not data["errors"]
     variant.refresh_from_db()
     assert variant.sku == sku
-    assert variant.attributes.first().values.first().slug == "red"
-    assert variant.attributes.last().values.first().slug == "big"
+    assert _get_attribute_value_slugs(variant) == [color, size]
 
 
 def test_update_product_variant_with_duplicated_attribute(
-    staff_api_client,
+    staff_api_client_with_products_perm,
     product_with_variant_with_two_attributes,
     color_attribute,
     size_attribute,
-    permission_manage_products,
 ):
     product = product_with_variant_with_two_attributes
     variant = product.variants.first()
     variant2 = product.variants.first()
 
     variant2.pk = None
-    variant2.sku = str(uuid4())[:12]
+    variant2.sku = _get_unique_sku()
     variant2.save()
     associate_attribute_values_to_instance(
         variant2, color_attribute, color_attribute.values.last()
@@ -973,14 +951,12 @@ def test_update_product_variant_with_duplicated_attribute(
         variant2, size_attribute, size_attribute.values.last()
     )
 
-    assert variant.attributes.first().values.first().slug == "red"
-    assert variant.attributes.last().values.first().slug == "small"
-    assert variant2.attributes.first().values.first().slug == "blue"
-    assert variant2.attributes.last().values.first().slug == "big"
+    assert _get_attribute_value_slugs(variant) == ["red", "small"]
+    assert _get_attribute_value_slugs(variant2) == ["blue", "big"]
 
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    color_attribute_id = graphene.Node.to_global_id("Attribute", color_attribute.pk)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
+    color_attribute_id = to_global_id("Attribute", color_attribute.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
 
     variables = {
         "id": variant_id,
@@ -991,10 +967,8 @@ def test_update_product_variant_with_duplicated_attribute(
         ],
     }
 
-    response = staff_api_client.post_graphql(
-        QUERY_UPDATE_VARIANT_ATTRIBUTES,
-        variables,
-        permissions=[permission_manage_products],
+    response = staff_api_client_with_products_perm.post_graphql(
+        QUERY_UPDATE_VARIANT_ATTRIBUTES, variables
     )
     content = get_graphql_content(response)
 
@@ -1005,17 +979,17 @@ def test_update_product_variant_with_duplicated_attribute(
     }
 
 
-@pytest.mark.parametrize(
-    "values, message",
-    (
-        ([], "Attribute expects a value but none were given"),
-        (["one", "two"], "A variant attribute cannot take more than one value"),
-        (["   "], "Attribute values cannot be blank"),
-        ([None], "Attribute values cannot be blank"),
-    ),
+INVALID_VARIANT_ATTRIBUTE_VALUES = (
+    ([], "Attribute expects a value but none were given"),
+    (["one", "two"], "A variant attribute cannot take more than one value"),
+    (["   "], "Attribute values cannot be blank"),
+    ([None], "Attribute values cannot be blank"),
 )
+
+
+@pytest.mark.parametrize("values, message", INVALID_VARIANT_ATTRIBUTE_VALUES)
 def test_update_product_variant_requires_values(
-    staff_api_client, variant, product_type, permission_manage_products, values, message
+    staff_api_client_with_products_perm, variant, size_attribute, values, message
 ):
     """Ensures updating a variant with invalid values raise an error.
 
@@ -1028,10 +1002,8 @@ def test_update_product_variant_requires_values(
     sku = "updated"
 
     query = QUERY_UPDATE_VARIANT_ATTRIBUTES
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    attr_id = graphene.Node.to_global_id(
-        "Attribute", product_type.variant_attributes.first().id
-    )
+    variant_id = to_global_id("ProductVariant", variant.pk)
+    attr_id = to_global_id("Attribute", size_attribute.pk)
 
     variables = {
         "id": variant_id,
@@ -1040,25 +1012,14 @@ def test_update_product_variant_requires_values(
         "sku": sku,
     }
 
-    response = staff_api_client.post_graphql(
-        query, variables, permissions=[permission_manage_products]
-    )
-    variant.refresh_from_db()
-    content = get_graphql_content(response)
-    assert (
-        len(content["data"]["productVariantUpdate"]["errors"]) == 1
-    ), f"expected: {message}"
-    assert content["data"]["productVariantUpdate"]["errors"][0] == {
-        "field": "attributes",
-        "message": message,
-    }
+    content = staff_api_client_with_products_perm.execute_graphql(query, variables)
+    errors = content["data"]["productVariantUpdate"]["errors"]
+    assert len(errors) == 1, f"expected: {message}"
+    assert errors[0] == {"field": "attributes", "message": message}
     assert not variant.product.variants.filter(sku=sku).exists()
 
 
-def test_update_product_variant_with_price_does_not_raise_price_validation_error(
-    staff_api_client, variant, size_attribute, permission_manage_products
-):
-    mutation = """
+UPDATE_VARIANT_WITHOUT_PRICE_MUTATION = """
     mutation updateVariant ($id: ID!, $attributes: [AttributeValueInput]) {
         productVariantUpdate(
             id: $id,
@@ -1077,18 +1038,23 @@ def test_update_product_variant_with_price_does_not_raise_price_validation_error
             }
         }
     }
-    """
+"""
+
+
+def test_update_product_variant_with_price_does_not_raise_price_validation_error(
+    staff_api_client_with_products_perm, variant, size_attribute
+):
     # given a product variant and an attribute
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
+    attribute_id = to_global_id("Attribute", size_attribute.pk)
 
     # when running the updateVariant mutation without price input field
     variables = {
         "id": variant_id,
         "attributes": [{"id": attribute_id, "values": ["S"]}],
     }
-    response = staff_api_client.post_graphql(
-        mutation, variables, permissions=[permission_manage_products]
+    response = staff_api_client_with_products_perm.post_graphql(
+        UPDATE_VARIANT_WITHOUT_PRICE_MUTATION, variables
     )
 
     # then mutation passes without validation errors
@@ -1115,7 +1081,7 @@ DELETE_VARIANT_MUTATION = """
 def test_delete_variant(staff_api_client, product, permission_manage_products):
     query = DELETE_VARIANT_MUTATION
     variant = product.variants.first()
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
     variables = {"id": variant_id}
     response = staff_api_client.post_graphql(
         query, variables, permissions=[permission_manage_products]
@@ -1137,22 +1103,20 @@ def test_delete_variant_in_draft_order(
     draft_order.save(update_fields=["status"])
 
     variant = order_line.variant
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
     variables = {"id": variant_id}
 
-    net = variant.get_price()
-    gross = Money(amount=net.amount, currency=net.currency)
-    order_not_draft = order_list[-1]
-    order_line_not_in_draft = OrderLine.objects.create(
+    order_line_not_in_draft = OrderLine(
         variant=variant,
-        order=order_not_draft,
+        order_id=order_list[-1].pk,
         product_name=str(variant.product),
         variant_name=str(variant),
         product_sku=variant.sku,
         is_shipping_required=variant.is_shipping_required(),
-        unit_price=TaxedMoney(net=net, gross=gross),
+        unit_price=order_line.unit_price,
         quantity=3,
     )
+    OrderLine.objects.bulk_create([order_line_not_in_draft])
     order_line_not_in_draft_pk = order_line_not_in_draft.pk
 
     response = staff_api_client.post_graphql(
@@ -1162,10 +1126,12 @@ def test_delete_variant_in_draft_order(
     content = get_graphql_content(response)
     data = content["data"]["productVariantDelete"]
     assert data["productVariant"]["sku"] == variant.sku
-    with pytest.raises(order_line._meta.model.DoesNotExist):
-        order_line.refresh_from_db()
-
-    assert OrderLine.objects.filter(pk=order_line_not_in_draft_pk).exists()
+    remaining_order_line_pks = set(
+        OrderLine.objects.filter(
+            pk__in=[order_line.pk, order_line_not_in_draft_pk]
+        ).values_list("pk", flat=True)
+    )
+    assert remaining_order_line_pks == {order_line_not_in_draft_pk}
 
 
 def test_delete_default_variant(
@@ -1183,7 +1149,7 @@ def test_delete_default_variant(
 
     assert second_variant.pk != default_variant.pk
 
-    variant_id = graphene.Node.to_global_id("ProductVariant", default_variant.pk)
+    variant_id = to_global_id("ProductVariant", default_variant.pk)
     variables = {"id": variant_id}
 
     # when
@@ -1217,7 +1183,7 @@ def test_delete_not_default_variant_left_default_variant_unchanged(
 
     assert second_variant.pk != default_variant.pk
 
-    variant_id = graphene.Node.to_global_id("ProductVariant", second_variant.pk)
+    variant_id = to_global_id("ProductVariant", second_variant.pk)
     variables = {"id": variant_id}
 
     # when
@@ -1249,7 +1215,7 @@ def test_delete_default_all_product_variant_left_product_default_variant_unset(
 
     assert product.variants.count() == 1
 
-    variant_id = graphene.Node.to_global_id("ProductVariant", default_variant.pk)
+    variant_id = to_global_id("ProductVariant", default_variant.pk)
     variables = {"id": variant_id}
 
     # when
@@ -1268,8 +1234,7 @@ def test_delete_default_all_product_variant_left_product_default_variant_unset(
     assert not product.default_variant
 
 
-def _fetch_all_variants(client, permissions=None):
-    query = """
+QUERY_FETCH_ALL_VARIANTS = """
         query fetchAllVariants {
             productVariants(first: 10) {
                 totalCount
@@ -1280,11 +1245,19 @@ def _fetch_all_variants(client, permissions=None):
                 }
             }
         }
-    """
-    response = client.post_graphql(
-        query, {}, permissions=permissions, check_no_permissions=False
+"""
+
+
+@pytest.fixture
+def client_fixture(request):
+    """Return the API client fixture named by the test parametrization."""
+    return request.getfixturevalue(request.param)
+
+
+def _fetch_all_variants(client, permissions=None):
+    content = client.execute_graphql(
+        QUERY_FETCH_ALL_VARIANTS, permissions=permissions, check_no_permissions=False
     )
-    content = get_graphql_content(response)
     return content["data"]["productVariants"]
 
 
@@ -1295,25 +1268,25 @@ def test_fetch_all_variants_staff_user(
         staff_api_client, permissions=[permission_manage_products]
     )
     variant = unavailable_product_with_variant.variants.first()
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
+    variant_id = to_global_id("ProductVariant", variant.pk)
     assert data["totalCount"] == 1
     assert data["edges"][0]["node"]["id"] == variant_id
 
 
-def test_fetch_all_variants_customer(user_api_client, unavailable_product_with_variant):
-    data = _fetch_all_variants(user_api_client)
-    assert data["totalCount"] == 0
-
-
-def test_fetch_all_variants_anonymous_user(
-    api_client, unavailable_product_with_variant
+@pytest.mark.parametrize(
+    "client_fixture",
+    ["user_api_client", "api_client"],
+    ids=["customer", "anonymous_user"],
+    indirect=True,
+)
+def test_fetch_all_variants_customer_or_anonymous_user(
+    client_fixture, unavailable_product_with_variant
 ):
-    data = _fetch_all_variants(api_client)
+    data = _fetch_all_variants(client_fixture)
     assert data["totalCount"] == 0
 
 
-def test_product_variants_by_ids(user_api_client, variant):
-    query = """
+QUERY_VARIANTS_BY_IDS = """
         query getProduct($ids: [ID!]) {
             productVariants(ids: $ids, first: 1) {
                 edges {
@@ -1323,96 +1296,65 @@ def test_product_variants_by_ids(user_api_client, variant):
                 }
             }
         }
-    """
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.id)
+"""
+
+
+def test_product_variants_by_ids(user_api_client, variant):
+    variant_id = to_global_id("ProductVariant", variant.pk)
 
     variables = {"ids": [variant_id]}
-    response = user_api_client.post_graphql(query, variables)
+    response = user_api_client.post_graphql(QUERY_VARIANTS_BY_IDS, variables)
     content = get_graphql_content(response)
     data = content["data"]["productVariants"]
     assert data["edges"][0]["node"]["id"] == variant_id
     assert len(data["edges"]) == 1
 
 
-def test_product_variants_visible_in_listings_by_customer(
-    user_api_client, product_list
-):
-    # given
-    product_list[0].visible_in_listings = False
-    product_list[0].save(update_fields=["visible_in_listings"])
-
-    product_count = Product.objects.count()
-
-    # when
-    data = _fetch_all_variants(user_api_client)
-
-    assert data["totalCount"] == product_count - 1
-
-
-def test_product_variants_visible_in_listings_by_staff_without_perm(
-    staff_api_client, product_list
-):
-    # given
-    product_list[0].visible_in_listings = False
-    product_list[0].save(update_fields=["visible_in_listings"])
-
-    product_count = Product.objects.count()
-
-    # when
-    data = _fetch_all_variants(staff_api_client)
-
-    assert data["totalCount"] == product_count - 1
-
-
-def test_product_variants_visible_in_listings_by_staff_with_perm(
-    staff_api_client, product_list, permission_manage_products
-):
-    # given
-    product_list[0].visible_in_listings = False
-    product_list[0].save(update_fields=["visible_in_listings"])
-
-    product_count = Product.objects.count()
-
-    # when
-    data = _fetch_all_variants(
-        staff_api_client, permissions=[permission_manage_products]
-    )
-
-    assert data["totalCount"] == product_count
-
-
-def test_product_variants_visible_in_listings_by_app_without_perm(
-    app_api_client, product_list
-):
-    # given
-    product_list[0].visible_in_listings = False
-    product_list[0].save(update_fields=["visible_in_listings"])
-
-    product_count = Product.objects.count()
-
-    # when
-    data = _fetch_all_variants(app_api_client)
-
-    assert data["totalCount"] == product_count - 1
+@pytest.fixture
+def hidden_product_list(product_list):
+    """Return the product list with the first product hidden in listings."""
+    hidden_product = product_list[0]
+    Product.objects.filter(pk=hidden_product.pk).update(visible_in_listings=False)
+    hidden_product.visible_in_listings = False
+    return product_list
 
 
-def test_product_variants_visible_in_listings_by_app_with_perm(
-    app_api_client, product_list, permission_manage_products
+@pytest.mark.parametrize(
+    "client_fixture, with_permission, visible_product_count_delta",
+    [
+        ("user_api_client", False, -1),
+        ("staff_api_client", False, -1),
+        ("staff_api_client", True, 0),
+        ("app_api_client", False, -1),
+        ("app_api_client", True, 0),
+    ],
+    ids=[
+        "customer",
+        "staff_without_perm",
+        "staff_with_perm",
+        "app_without_perm",
+        "app_with_perm",
+    ],
+    indirect=["client_fixture"],
+)
+def test_product_variants_visible_in_listings(
+    client_fixture,
+    hidden_product_list,
+    permission_manage_products,
+    with_permission,
+    visible_product_count_delta,
 ):
     # given
-    product_list[0].visible_in_listings = False
-    product_list[0].save(update_fields=["visible_in_listings"])
-
-    product_count = Product.objects.count()
+    permissions = [permission_manage_products] if with_permission else None
+    product_count = len(hidden_product_list)
 
     # when
-    data = _fetch_all_variants(app_api_client, permissions=[permission_manage_products])
+    data = _fetch_all_variants(client_fixture, permissions=permissions)
 
-    assert data["totalCount"] == product_count
+    assert data["totalCount"] == product_count + visible_product_count_delta
 
 
-def _fetch_variant(client, variant, permissions=None):
-    query = """
+QUERY_FETCH_VARIANT_WITH_PRODUCT = """
     query ProductVariantDetails($variantId: ID!) {
         productVariant(id: $variantId) {
             id
@@ -1421,12 +1363,17 @@ def _fetch_variant(client, variant, permissions=None):
             }
         }
     }
-    """
-    variables = {"variantId": graphene.Node.to_global_id("ProductVariant", variant.id)}
-    response = client.post_graphql(
-        query, variables, permissions=permissions, check_no_permissions=False
+"""
+
+
+def _fetch_variant(client, variant, permissions=None):
+    variables = {"variantId": to_global_id("ProductVariant", variant.pk)}
+    content = client.execute_graphql(
+        QUERY_FETCH_VARIANT_WITH_PRODUCT,
+        variables,
+        permissions=permissions,
+        check_no_permissions=False,
     )
-    content = get_graphql_content(response)
     return content["data"]["productVariant"]
 
 
@@ -1438,28 +1385,24 @@ def test_fetch_unpublished_variant_staff_user(
         staff_api_client, variant, permissions=[permission_manage_products]
     )
 
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    product_id = graphene.Node.to_global_id(
-        "Product", unavailable_product_with_variant.pk
-    )
+    variant_id = to_global_id("ProductVariant", variant.pk)
+    product_id = to_global_id("Product", unavailable_product_with_variant.pk)
 
     assert data["id"] == variant_id
     assert data["product"]["id"] == product_id
 
 
-def test_fetch_unpublished_variant_customer(
-    user_api_client, unavailable_product_with_variant
-):
-    variant = unavailable_product_with_variant.variants.first()
-    data = _fetch_variant(user_api_client, variant)
-    assert data is None
-
-
-def test_fetch_unpublished_variant_anonymous_user(
-    api_client, unavailable_product_with_variant
+@pytest.mark.parametrize(
+    "client_fixture",
+    ["user_api_client", "api_client"],
+    ids=["customer", "anonymous_user"],
+    indirect=True,
+)
+def test_fetch_unpublished_variant_customer_or_anonymous_user(
+    client_fixture, unavailable_product_with_variant
 ):
     variant = unavailable_product_with_variant.variants.first()
-    data = _fetch_variant(api_client, variant)
+    data = _fetch_variant(client_fixture, variant)
     assert data is None
 
 
@@ -1494,15 +1437,21 @@ PRODUCT_VARIANT_BULK_CREATE_MUTATION = """
 """
 
 
+def _get_last_variant_pk():
+    """Return the primary key of the latest variant, or 0 if there are none."""
+    return ProductVariant.objects.aggregate(Max("pk"))["pk__max"] or 0
+
+
 def test_product_variant_bulk_create_by_attribute_id(
-    staff_api_client, product, size_attribute, permission_manage_products
+    staff_api_client_with_products_perm, product, size_attribute
 ):
-    product_variant_count = ProductVariant.objects.count()
-    attribute_value_count = size_attribute.values.count()
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    attribut_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
-    attribute_value = size_attribute.values.last()
-    sku = str(uuid4())[:12]
+    last_variant_pk = _get_last_variant_pk()
+    product_id = to_global_id("Product", product.pk)
+    attribut_id = to_global_id("Attribute", size_attribute.pk)
+    attribute_values = list(size_attribute.values.all())
+    attribute_value_count = len(attribute_values)
+    attribute_value = attribute_values[-1]
+    sku = _get_unique_sku()
     variants = [
         {
             "sku": sku,
@@ -1515,15 +1464,13 @@ def test_product_variant_bulk_create_by_attribute_id(
     ]
 
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     assert not data["bulkProductErrors"]
     assert data["count"] == 1
-    assert product_variant_count + 1 == ProductVariant.objects.count()
+    assert ProductVariant.objects.filter(pk__gt=last_variant_pk).count() == 1
     assert attribute_value_count == size_attribute.values.count()
     product_variant = ProductVariant.objects.get(sku=sku)
     assert not product_variant.cost_price
@@ -1533,13 +1480,13 @@ def test_product_variant_bulk_create_by_attribute_id(
     "price_field", ("price", "costPrice",),
 )
 def test_product_variant_bulk_create_by_attribute_id_with_negative_price(
-    staff_api_client, product, size_attribute, permission_manage_products, price_field
+    staff_api_client_with_products_perm, product, size_attribute, price_field
 ):
     # given
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    attribut_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    product_id = to_global_id("Product", product.pk)
+    attribut_id = to_global_id("Attribute", size_attribute.pk)
     attribute_value = size_attribute.values.last()
-    sku = str(uuid4())[:12]
+    sku = _get_unique_sku()
     variant = {
         "sku": sku,
         "weight": 2.5,
@@ -1550,10 +1497,9 @@ def test_product_variant_bulk_create_by_attribute_id_with_negative_price(
     }
 
     variables = {"productId": product_id, "variants": [variant]}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
 
     # when
-    response = staff_api_client.post_graphql(
+    response = staff_api_client_with_products_perm.post_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
 
@@ -1565,13 +1511,13 @@ def test_product_variant_bulk_create_by_attribute_id_with_negative_price(
     "price_field", ("price", "costPrice",),
 )
 def test_product_variant_bulk_create_too_many_decimal_places_in_price(
-    staff_api_client, product, size_attribute, permission_manage_products, price_field
+    staff_api_client_with_products_perm, product, size_attribute, price_field
 ):
     # given
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    attribut_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    product_id = to_global_id("Product", product.pk)
+    attribut_id = to_global_id("Attribute", size_attribute.pk)
     attribute_value = size_attribute.values.last()
-    sku = str(uuid4())[:12]
+    sku = _get_unique_sku()
     variant = {
         "sku": sku,
         "weight": 2.5,
@@ -1582,187 +1528,155 @@ def test_product_variant_bulk_create_too_many_decimal_places_in_price(
     }
 
     variables = {"productId": product_id, "variants": [variant]}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
 
     # when
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
 
     # then
-    content = get_graphql_content(response)
-    data = content["data"]["productVariantBulkCreate"]
-    error = data["bulkProductErrors"][0]
-    assert error["field"] == price_field
-    assert error["code"] == ProductErrorCode.INVALID.name
+    errors = content["data"]["productVariantBulkCreate"]["bulkProductErrors"]
+    assert [(error["field"], error["code"]) for error in errors] == [
+        (price_field, ProductErrorCode.INVALID.name)
+    ]
 
 
 def test_product_variant_bulk_create_empty_attribute(
-    staff_api_client, product, size_attribute, permission_manage_products
+    staff_api_client_with_products_perm, product, size_attribute
 ):
-    product_variant_count = ProductVariant.objects.count()
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    variants = [{"sku": str(uuid4())[:12], "attributes": [], "price": 10}]
+    last_variant_pk = _get_last_variant_pk()
+    product_id = to_global_id("Product", product.pk)
+    variants = [{"sku": _get_unique_sku(), "attributes": [], "price": 10}]
 
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     assert not data["bulkProductErrors"]
     assert data["count"] == 1
-    assert product_variant_count + 1 == ProductVariant.objects.count()
+    assert ProductVariant.objects.filter(pk__gt=last_variant_pk).count() == 1
 
 
 def test_product_variant_bulk_create_with_new_attribute_value(
-    staff_api_client, product, size_attribute, permission_manage_products
+    staff_api_client_with_products_perm, product, size_attribute
 ):
-    product_variant_count = ProductVariant.objects.count()
-    attribute_value_count = size_attribute.values.count()
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    attribute_value = size_attribute.values.last()
+    last_variant_pk = _get_last_variant_pk()
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
+    product_id = to_global_id("Product", product.pk)
+    attribute_values = list(size_attribute.values.all())
+    attribute_value_count = len(attribute_values)
+    attribute_value = attribute_values[-1]
     variants = [
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [{"id": size_attribute_id, "values": [attribute_value.name]}],
             "price": 10,
         },
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [{"id": size_attribute_id, "values": ["Test-attribute"]}],
             "price": 10,
         },
     ]
 
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     assert not data["bulkProductErrors"]
     assert data["count"] == 2
-    assert product_variant_count + 2 == ProductVariant.objects.count()
+    assert ProductVariant.objects.filter(pk__gt=last_variant_pk).count() == 2
     assert attribute_value_count + 1 == size_attribute.values.count()
 
 
+# (warehouse index, quantity) pairs of the stocks of each variant created in
+# test_product_variant_bulk_create_stocks_input.
+BULK_CREATE_EXPECTED_STOCKS = (
+    ((0, 10),),
+    ((0, 15), (1, 15)),
+)
+
+
+def _get_stock_quantities(stocks):
+    """Return the set of the (warehouse slug, quantity) pairs of the stocks."""
+    return {(stock["warehouse"]["slug"], stock["quantity"]) for stock in stocks}
+
+
 def test_product_variant_bulk_create_stocks_input(
-    staff_api_client, product, permission_manage_products, warehouses, size_attribute
+    staff_api_client_with_products_perm, product, warehouses, size_attribute
 ):
-    product_variant_count = ProductVariant.objects.count()
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    attribute_value_count = size_attribute.values.count()
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
-    attribute_value = size_attribute.values.last()
+    last_variant_pk = _get_last_variant_pk()
+    product_id = to_global_id("Product", product.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
+    attribute_values = list(size_attribute.values.all())
+    attribute_value_count = len(attribute_values)
+    attribute_value = attribute_values[-1]
+    warehouse1_id = to_global_id("Warehouse", warehouses[0].pk)
+    warehouse2_id = to_global_id("Warehouse", warehouses[1].pk)
     variants = [
         {
-            "sku": str(uuid4())[:12],
-            "stocks": [
-                {
-                    "quantity": 10,
-                    "warehouse": graphene.Node.to_global_id(
-                        "Warehouse", warehouses[0].pk
-                    ),
-                }
-            ],
+            "sku": _get_unique_sku(),
+            "stocks": [{"quantity": 10, "warehouse": warehouse1_id}],
             "attributes": [{"id": size_attribute_id, "values": [attribute_value.name]}],
             "price": 10,
         },
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [{"id": size_attribute_id, "values": ["Test-attribute"]}],
             "stocks": [
-                {
-                    "quantity": 15,
-                    "warehouse": graphene.Node.to_global_id(
-                        "Warehouse", warehouses[0].pk
-                    ),
-                },
-                {
-                    "quantity": 15,
-                    "warehouse": graphene.Node.to_global_id(
-                        "Warehouse", warehouses[1].pk
-                    ),
-                },
+                {"quantity": 15, "warehouse": warehouse1_id},
+                {"quantity": 15, "warehouse": warehouse2_id},
             ],
             "price": 10,
         },
     ]
 
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     assert not data["bulkProductErrors"]
     assert data["count"] == 2
-    assert product_variant_count + 2 == ProductVariant.objects.count()
+    assert ProductVariant.objects.filter(pk__gt=last_variant_pk).count() == 2
     assert attribute_value_count + 1 == size_attribute.values.count()
 
-    expected_result = {
-        variants[0]["sku"]: {
-            "sku": variants[0]["sku"],
-            "stocks": [
-                {
-                    "warehouse": {"slug": warehouses[0].slug},
-                    "quantity": variants[0]["stocks"][0]["quantity"],
-                }
-            ],
-            "price": {"amount": 10.0},
-        },
-        variants[1]["sku"]: {
-            "sku": variants[1]["sku"],
-            "stocks": [
-                {
-                    "warehouse": {"slug": warehouses[0].slug},
-                    "quantity": variants[1]["stocks"][0]["quantity"],
-                },
-                {
-                    "warehouse": {"slug": warehouses[1].slug},
-                    "quantity": variants[1]["stocks"][1]["quantity"],
-                },
-            ],
-            "price": {"amount": 10.0},
-        },
+    variants_data = {
+        variant_data["sku"]: variant_data for variant_data in data["productVariants"]
     }
-    for variant_data in data["productVariants"]:
-        variant_data.pop("id")
-        assert variant_data["sku"] in expected_result
-        expected_variant = expected_result[variant_data["sku"]]
-        expected_stocks = expected_variant["stocks"]
-        assert variant_data["price"] == expected_variant["price"]
-        assert all([stock in expected_stocks for stock in variant_data["stocks"]])
+    assert variants_data.keys() == {variant["sku"] for variant in variants}
+    for variant, expected_stocks in zip(variants, BULK_CREATE_EXPECTED_STOCKS):
+        variant_data = variants_data[variant["sku"]]
+        assert variant_data["price"] == {"amount": 10.0}
+        assert _get_stock_quantities(variant_data["stocks"]) == {
+            (warehouses[warehouse_index].slug, quantity)
+            for warehouse_index, quantity in expected_stocks
+        }
 
 
 def test_product_variant_bulk_create_duplicated_warehouses(
-    staff_api_client, product, permission_manage_products, warehouses, size_attribute
+    staff_api_client_with_products_perm, product, warehouses, size_attribute
 ):
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    product_id = to_global_id("Product", product.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
     attribute_value = size_attribute.values.last()
-    warehouse1_id = graphene.Node.to_global_id("Warehouse", warehouses[0].pk)
+    warehouse1_id = to_global_id("Warehouse", warehouses[0].pk)
     variants = [
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "stocks": [
                 {
                     "quantity": 10,
-                    "warehouse": graphene.Node.to_global_id(
-                        "Warehouse", warehouses[1].pk
-                    ),
+                    "warehouse": to_global_id("Warehouse", warehouses[1].pk),
                 }
             ],
             "attributes": [{"id": size_attribute_id, "values": [attribute_value.name]}],
             "price": 10,
         },
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [{"id": size_attribute_id, "values": ["Test-attribute"]}],
             "stocks": [
                 {"quantity": 15, "warehouse": warehouse1_id},
@@ -1773,11 +1687,9 @@ def test_product_variant_bulk_create_duplicated_warehouses(
     ]
 
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     errors = data["bulkProductErrors"]
 
@@ -1791,15 +1703,14 @@ def test_product_variant_bulk_create_duplicated_warehouses(
 
 
 def test_product_variant_bulk_create_duplicated_sku(
-    staff_api_client,
+    staff_api_client_with_products_perm,
     product,
     product_with_default_variant,
     size_attribute,
-    permission_manage_products,
 ):
-    product_variant_count = ProductVariant.objects.count()
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    last_variant_pk = _get_last_variant_pk()
+    product_id = to_global_id("Product", product.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
     sku = product.variants.first().sku
     sku2 = product_with_default_variant.variants.first().sku
     assert not sku == sku2
@@ -1817,28 +1728,24 @@ def test_product_variant_bulk_create_duplicated_sku(
     ]
 
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
-    data = content["data"]["productVariantBulkCreate"]
-    assert len(data["bulkProductErrors"]) == 2
-    errors = data["bulkProductErrors"]
-    for index, error in enumerate(errors):
-        assert error["field"] == "sku"
-        assert error["code"] == ProductErrorCode.UNIQUE.name
-        assert error["index"] == index
-    assert product_variant_count == ProductVariant.objects.count()
+    errors = content["data"]["productVariantBulkCreate"]["bulkProductErrors"]
+    assert [(error["field"], error["code"], error["index"]) for error in errors] == [
+        ("sku", ProductErrorCode.UNIQUE.name, 0),
+        ("sku", ProductErrorCode.UNIQUE.name, 1),
+    ]
+    assert not ProductVariant.objects.filter(pk__gt=last_variant_pk).exists()
 
 
 def test_product_variant_bulk_create_duplicated_sku_in_input(
-    staff_api_client, product, size_attribute, permission_manage_products
+    staff_api_client_with_products_perm, product, size_attribute
 ):
-    product_variant_count = ProductVariant.objects.count()
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
-    sku = str(uuid4())[:12]
+    last_variant_pk = _get_last_variant_pk()
+    product_id = to_global_id("Product", product.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
+    sku = _get_unique_sku()
     variants = [
         {
             "sku": sku,
@@ -1853,39 +1760,35 @@ def test_product_variant_bulk_create_duplicated_sku_in_input(
     ]
 
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     assert len(data["bulkProductErrors"]) == 1
     error = data["bulkProductErrors"][0]
     assert error["field"] == "sku"
     assert error["code"] == ProductErrorCode.UNIQUE.name
     assert error["index"] == 1
-    assert product_variant_count == ProductVariant.objects.count()
+    assert not ProductVariant.objects.filter(pk__gt=last_variant_pk).exists()
 
 
 def test_product_variant_bulk_create_many_errors(
-    staff_api_client, product, size_attribute, permission_manage_products
+    staff_api_client_with_products_perm, product, size_attribute
 ):
-    product_variant_count = ProductVariant.objects.count()
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.pk)
+    last_variant_pk = _get_last_variant_pk()
+    product_id = to_global_id("Product", product.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
     non_existent_attribute_pk = 0
-    invalid_attribute_id = graphene.Node.to_global_id(
-        "Attribute", non_existent_attribute_pk
-    )
+    invalid_attribute_id = to_global_id("Attribute", non_existent_attribute_pk)
     sku = product.variants.first().sku
     variants = [
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [{"id": size_attribute_id, "values": ["Test-value1"]}],
             "price": 10,
         },
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [{"id": size_attribute_id, "values": ["Test-value4"]}],
             "price": 10,
         },
@@ -1895,18 +1798,16 @@ def test_product_variant_bulk_create_many_errors(
             "price": 10,
         },
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [{"id": invalid_attribute_id, "values": ["Test-value3"]}],
             "price": 10,
         },
     ]
 
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     assert len(data["bulkProductErrors"]) == 2
     errors = data["bulkProductErrors"]
@@ -1928,96 +1829,115 @@ def test_product_variant_bulk_create_many_errors(
     ]
     for expected_error in expected_errors:
         assert expected_error in errors
-    assert product_variant_count == ProductVariant.objects.count()
+    assert not ProductVariant.objects.filter(pk__gt=last_variant_pk).exists()
 
 
+def test_product_variant_bulk_create_number_of_queries_grows_linearly(
+    staff_api_client_with_products_perm,
+    product,
+    size_attribute,
+    warehouse,
+    capture_queries,
+):
+    product_id = to_global_id("Product", product.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
+    warehouse_id = to_global_id("Warehouse", warehouse.pk)
+
+    def bulk_create_variants(count):
+        variants = []
+        for _ in range(count):
+            sku = _get_unique_sku()
+            variants.append(
+                {
+                    "sku": sku,
+                    "attributes": [{"id": size_attribute_id, "values": [sku]}],
+                    "stocks": [{"warehouse": warehouse_id, "quantity": 10}],
+                    "price": 10,
+                }
+            )
+        variables = {"productId": product_id, "variants": variants}
+        with capture_queries() as queries:
+            content = staff_api_client_with_products_perm.execute_graphql(
+                PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
+            )
+        data = content["data"]["productVariantBulkCreate"]
+        assert not data["bulkProductErrors"]
+        assert data["count"] == count
+        return len(queries)
+
+    # The first request warms up process-wide caches, e.g. the current site.
+    bulk_create_variants(1)
+
+    queries_for_one_variant = bulk_create_variants(1)
+    queries_for_two_variants = bulk_create_variants(2)
+    queries_for_four_variants = bulk_create_variants(4)
+
+    queries_per_variant = queries_for_two_variants - queries_for_one_variant
+    assert queries_for_four_variants - queries_for_two_variants <= (
+        2 * queries_per_variant
+    )
+
+
+@pytest.mark.parametrize(
+    "variants_attribute_values, duplicated_variant_index",
+    [
+        # the product already has a variant with these values
+        ([("red", "small")], 0),
+        # two variants in the input have the same values
+        ([("blue", "big"), ("blue", "big")], 1),
+    ],
+)
 def test_product_variant_bulk_create_two_variants_duplicated_attribute_value(
-    staff_api_client,
+    variants_attribute_values,
+    duplicated_variant_index,
+    staff_api_client_with_products_perm,
     product_with_variant_with_two_attributes,
     color_attribute,
     size_attribute,
-    permission_manage_products,
 ):
     product = product_with_variant_with_two_attributes
-    product_variant_count = ProductVariant.objects.count()
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    color_attribute_id = graphene.Node.to_global_id("Attribute", color_attribute.id)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.id)
+    last_variant_pk = _get_last_variant_pk()
+    product_id = to_global_id("Product", product.pk)
+    color_attribute_id = to_global_id("Attribute", color_attribute.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
     variants = [
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [
-                {"id": color_attribute_id, "values": ["red"]},
-                {"id": size_attribute_id, "values": ["small"]},
+                {"id": color_attribute_id, "values": [color]},
+                {"id": size_attribute_id, "values": [size]},
             ],
             "price": 10,
         }
+        for color, size in variants_attribute_values
     ]
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
-        PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
-    )
-    content = get_graphql_content(response)
-    data = content["data"]["productVariantBulkCreate"]
-    assert len(data["bulkProductErrors"]) == 1
-    error = data["bulkProductErrors"][0]
-    assert error["field"] == "attributes"
-    assert error["code"] == ProductErrorCode.DUPLICATED_INPUT_ITEM.name
-    assert error["index"] == 0
-    assert product_variant_count == ProductVariant.objects.count()
-
-
-def test_product_variant_bulk_create_two_variants_duplicated_attribute_value_in_input(
-    staff_api_client,
-    product_with_variant_with_two_attributes,
-    permission_manage_products,
-    color_attribute,
-    size_attribute,
-):
-    product = product_with_variant_with_two_attributes
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    product_variant_count = ProductVariant.objects.count()
-    color_attribute_id = graphene.Node.to_global_id("Attribute", color_attribute.id)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.id)
-    attributes = [
-        {"id": color_attribute_id, "values": [color_attribute.values.last().slug]},
-        {"id": size_attribute_id, "values": [size_attribute.values.last().slug]},
-    ]
-    variants = [
-        {"sku": str(uuid4())[:12], "attributes": attributes, "price": 10},
-        {"sku": str(uuid4())[:12], "attributes": attributes, "price": 10},
-    ]
-    variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     assert len(data["bulkProductErrors"]) == 1
     error = data["bulkProductErrors"][0]
     assert error["field"] == "attributes"
     assert error["code"] == ProductErrorCode.DUPLICATED_INPUT_ITEM.name
-    assert error["index"] == 1
-    assert product_variant_count == ProductVariant.objects.count()
+    assert error["index"] == duplicated_variant_index
+    assert not ProductVariant.objects.filter(pk__gt=last_variant_pk).exists()
 
 
 def test_product_variant_bulk_create_two_variants_duplicated_one_attribute_value(
-    staff_api_client,
+    staff_api_client_with_products_perm,
     product_with_variant_with_two_attributes,
     color_attribute,
     size_attribute,
-    permission_manage_products,
 ):
     product = product_with_variant_with_two_attributes
-    product_variant_count = ProductVariant.objects.count()
-    product_id = graphene.Node.to_global_id("Product", product.pk)
-    color_attribute_id = graphene.Node.to_global_id("Attribute", color_attribute.id)
-    size_attribute_id = graphene.Node.to_global_id("Attribute", size_attribute.id)
+    last_variant_pk = _get_last_variant_pk()
+    product_id = to_global_id("Product", product.pk)
+    color_attribute_id = to_global_id("Attribute", color_attribute.pk)
+    size_attribute_id = to_global_id("Attribute", size_attribute.pk)
     variants = [
         {
-            "sku": str(uuid4())[:12],
+            "sku": _get_unique_sku(),
             "attributes": [
                 {"id": color_attribute_id, "values": ["red"]},
                 {"id": size_attribute_id, "values": ["big"]},
@@ -2026,15 +1946,47 @@ def test_product_variant_bulk_create_two_variants_duplicated_one_attribute_value
         }
     ]
     variables = {"productId": product_id, "variants": variants}
-    staff_api_client.user.user_permissions.add(permission_manage_products)
-    response = staff_api_client.post_graphql(
+    content = staff_api_client_with_products_perm.execute_graphql(
         PRODUCT_VARIANT_BULK_CREATE_MUTATION, variables
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantBulkCreate"]
     assert not data["bulkProductErrors"]
     assert data["count"] == 1
-    assert product_variant_count + 1 == ProductVariant.objects.count()
+    assert ProductVariant.objects.filter(pk__gt=last_variant_pk).count() == 1
+
+
+@pytest.fixture
+def second_warehouse(warehouse):
+    """Return a copy of the warehouse, without its shipping zones."""
+    return Warehouse.objects.create(
+        address=warehouse.address,
+        name=warehouse.name,
+        slug="second warehouse",
+        email=warehouse.email,
+    )
+
+
+def _get_stock_allocations(stocks):
+    """Return the set of the (warehouse slug, quantity, allocated) stock triples."""
+    return {
+        (stock["warehouse"]["slug"], stock["quantity"], stock["quantityAllocated"])
+        for stock in stocks
+    }
+
+
+@pytest.fixture
+def variant_id(variant):
+    return to_global_id("ProductVariant", variant.pk)
+
+
+@pytest.fixture
+def warehouse_id(warehouse):
+    return to_global_id("Warehouse", warehouse.pk)
+
+
+@pytest.fixture
+def second_warehouse_id(second_warehouse):
+    return to_global_id("Warehouse", second_warehouse.pk)
 
 
 VARIANT_STOCKS_CREATE_MUTATION = """
@@ -2063,102 +2015,75 @@ VARIANT_STOCKS_CREATE_MUTATION = """
 
 
 def test_variant_stocks_create(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client,
+    variant_id,
+    warehouse_id,
+    warehouse,
+    second_warehouse_id,
+    second_warehouse,
+    permission_manage_products,
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    second_warehouse = Warehouse.objects.get(pk=warehouse.pk)
-    second_warehouse.slug = "second warehouse"
-    second_warehouse.pk = None
-    second_warehouse.save()
-
     stocks = [
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.id),
-            "quantity": 20,
-        },
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", second_warehouse.id),
-            "quantity": 100,
-        },
+        {"warehouse": warehouse_id, "quantity": 20},
+        {"warehouse": second_warehouse_id, "quantity": 100},
     ]
     variables = {"variantId": variant_id, "stocks": stocks}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_CREATE_MUTATION,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksCreate"]
 
-    expected_result = [
-        {
-            "quantity": stocks[0]["quantity"],
-            "quantityAllocated": 0,
-            "warehouse": {"slug": warehouse.slug},
-        },
-        {
-            "quantity": stocks[1]["quantity"],
-            "quantityAllocated": 0,
-            "warehouse": {"slug": second_warehouse.slug},
-        },
-    ]
+    expected_result = {
+        (warehouse.slug, stocks[0]["quantity"], 0),
+        (second_warehouse.slug, stocks[1]["quantity"], 0),
+    }
     assert not data["bulkStockErrors"]
     assert len(data["productVariant"]["stocks"]) == len(stocks)
-    result = []
-    for stock in data["productVariant"]["stocks"]:
-        stock.pop("id")
-        result.append(stock)
-    for res in result:
-        assert res in expected_result
+    assert _get_stock_allocations(data["productVariant"]["stocks"]) == expected_result
 
 
 def test_variant_stocks_create_empty_stock_input(
-    staff_api_client, variant, permission_manage_products
+    staff_api_client, variant, variant_id, permission_manage_products
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-
     variables = {"variantId": variant_id, "stocks": []}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_CREATE_MUTATION,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksCreate"]
 
     assert not data["bulkStockErrors"]
-    assert len(data["productVariant"]["stocks"]) == variant.stocks.count()
+    assert data["productVariant"]["stocks"] == []
     assert data["productVariant"]["id"] == variant_id
+    assert not variant.stocks.exists()
 
 
 def test_variant_stocks_create_stock_already_exists(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client,
+    variant_id,
+    variant,
+    warehouse_id,
+    warehouse,
+    second_warehouse_id,
+    permission_manage_products,
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    second_warehouse = Warehouse.objects.get(pk=warehouse.pk)
-    second_warehouse.slug = "second warehouse"
-    second_warehouse.pk = None
-    second_warehouse.save()
-
-    Stock.objects.create(product_variant=variant, warehouse=warehouse, quantity=10)
+    Stock.objects.bulk_create(
+        [Stock(product_variant=variant, warehouse=warehouse, quantity=10)]
+    )
 
     stocks = [
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.id),
-            "quantity": 20,
-        },
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", second_warehouse.id),
-            "quantity": 100,
-        },
+        {"warehouse": warehouse_id, "quantity": 20},
+        {"warehouse": second_warehouse_id, "quantity": 100},
     ]
     variables = {"variantId": variant_id, "stocks": stocks}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_CREATE_MUTATION,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksCreate"]
     errors = data["bulkStockErrors"]
 
@@ -2169,31 +2094,23 @@ def test_variant_stocks_create_stock_already_exists(
 
 
 def test_variant_stocks_create_stock_duplicated_warehouse(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client,
+    variant_id,
+    warehouse_id,
+    second_warehouse_id,
+    permission_manage_products,
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    second_warehouse = Warehouse.objects.get(pk=warehouse.pk)
-    second_warehouse.slug = "second warehouse"
-    second_warehouse.pk = None
-    second_warehouse.save()
-
-    second_warehouse_id = graphene.Node.to_global_id("Warehouse", second_warehouse.id)
-
     stocks = [
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.id),
-            "quantity": 20,
-        },
+        {"warehouse": warehouse_id, "quantity": 20},
         {"warehouse": second_warehouse_id, "quantity": 100},
         {"warehouse": second_warehouse_id, "quantity": 120},
     ]
     variables = {"variantId": variant_id, "stocks": stocks}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_CREATE_MUTATION,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksCreate"]
     errors = data["bulkStockErrors"]
 
@@ -2204,35 +2121,31 @@ def test_variant_stocks_create_stock_duplicated_warehouse(
 
 
 def test_variant_stocks_create_stock_duplicated_warehouse_and_warehouse_already_exists(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client,
+    variant_id,
+    variant,
+    warehouse_id,
+    warehouse,
+    second_warehouse_id,
+    second_warehouse,
+    permission_manage_products,
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    second_warehouse = Warehouse.objects.get(pk=warehouse.pk)
-    second_warehouse.slug = "second warehouse"
-    second_warehouse.pk = None
-    second_warehouse.save()
-
-    second_warehouse_id = graphene.Node.to_global_id("Warehouse", second_warehouse.id)
-    Stock.objects.create(
-        product_variant=variant, warehouse=second_warehouse, quantity=10
+    Stock.objects.bulk_create(
+        [Stock(product_variant=variant, warehouse=second_warehouse, quantity=10)]
     )
 
     stocks = [
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.id),
-            "quantity": 20,
-        },
+        {"warehouse": warehouse_id, "quantity": 20},
         {"warehouse": second_warehouse_id, "quantity": 100},
         {"warehouse": second_warehouse_id, "quantity": 120},
     ]
 
     variables = {"variantId": variant_id, "stocks": stocks}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_CREATE_MUTATION,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksCreate"]
     errors = data["bulkStockErrors"]
 
@@ -2271,69 +2184,50 @@ VARIANT_STOCKS_UPDATE_MUTATIONS = """
 
 
 def test_product_variant_stocks_update(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client,
+    variant_id,
+    variant,
+    warehouse_id,
+    warehouse,
+    second_warehouse_id,
+    second_warehouse,
+    permission_manage_products,
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    second_warehouse = Warehouse.objects.get(pk=warehouse.pk)
-    second_warehouse.slug = "second warehouse"
-    second_warehouse.pk = None
-    second_warehouse.save()
-
-    Stock.objects.create(product_variant=variant, warehouse=warehouse, quantity=10)
+    Stock.objects.bulk_create(
+        [Stock(product_variant=variant, warehouse=warehouse, quantity=10)]
+    )
 
     stocks = [
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.id),
-            "quantity": 20,
-        },
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", second_warehouse.id),
-            "quantity": 100,
-        },
+        {"warehouse": warehouse_id, "quantity": 20},
+        {"warehouse": second_warehouse_id, "quantity": 100},
     ]
     variables = {"variantId": variant_id, "stocks": stocks}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_UPDATE_MUTATIONS,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksUpdate"]
 
-    expected_result = [
-        {
-            "quantity": stocks[0]["quantity"],
-            "quantityAllocated": 0,
-            "warehouse": {"slug": warehouse.slug},
-        },
-        {
-            "quantity": stocks[1]["quantity"],
-            "quantityAllocated": 0,
-            "warehouse": {"slug": second_warehouse.slug},
-        },
-    ]
+    expected_result = {
+        (warehouse.slug, stocks[0]["quantity"], 0),
+        (second_warehouse.slug, stocks[1]["quantity"], 0),
+    }
     assert not data["bulkStockErrors"]
     assert len(data["productVariant"]["stocks"]) == len(stocks)
-    result = []
-    for stock in data["productVariant"]["stocks"]:
-        stock.pop("id")
-        result.append(stock)
-    for res in result:
-        assert res in expected_result
+    assert _get_stock_allocations(data["productVariant"]["stocks"]) == expected_result
 
 
 def test_product_variant_stocks_update_with_empty_stock_list(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client, variant_id, permission_manage_products
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
     stocks = []
     variables = {"variantId": variant_id, "stocks": stocks}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_UPDATE_MUTATIONS,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksUpdate"]
 
     assert not data["bulkStockErrors"]
@@ -2341,37 +2235,29 @@ def test_product_variant_stocks_update_with_empty_stock_list(
 
 
 def test_variant_stocks_update_stock_duplicated_warehouse(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client,
+    variant_id,
+    variant,
+    warehouse_id,
+    warehouse,
+    second_warehouse_id,
+    permission_manage_products,
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    second_warehouse = Warehouse.objects.get(pk=warehouse.pk)
-    second_warehouse.slug = "second warehouse"
-    second_warehouse.pk = None
-    second_warehouse.save()
-
-    Stock.objects.create(product_variant=variant, warehouse=warehouse, quantity=10)
+    Stock.objects.bulk_create(
+        [Stock(product_variant=variant, warehouse=warehouse, quantity=10)]
+    )
 
     stocks = [
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.pk),
-            "quantity": 20,
-        },
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", second_warehouse.pk),
-            "quantity": 100,
-        },
-        {
-            "warehouse": graphene.Node.to_global_id("Warehouse", warehouse.pk),
-            "quantity": 150,
-        },
+        {"warehouse": warehouse_id, "quantity": 20},
+        {"warehouse": second_warehouse_id, "quantity": 100},
+        {"warehouse": warehouse_id, "quantity": 150},
     ]
     variables = {"variantId": variant_id, "stocks": stocks}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_UPDATE_MUTATIONS,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksUpdate"]
     errors = data["bulkStockErrors"]
 
@@ -2406,73 +2292,62 @@ VARIANT_STOCKS_DELETE_MUTATION = """
 
 
 def test_product_variant_stocks_delete_mutation(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client,
+    variant_id,
+    variant,
+    warehouse,
+    second_warehouse_id,
+    second_warehouse,
+    permission_manage_products,
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    second_warehouse = Warehouse.objects.get(pk=warehouse.pk)
-    second_warehouse.slug = "second warehouse"
-    second_warehouse.pk = None
-    second_warehouse.save()
-
-    Stock.objects.bulk_create(
+    stocks = Stock.objects.bulk_create(
         [
             Stock(product_variant=variant, warehouse=warehouse, quantity=10),
             Stock(product_variant=variant, warehouse=second_warehouse, quantity=140),
         ]
     )
-    stocks_count = variant.stocks.count()
+    stocks_count = len(stocks)
 
-    warehouse_ids = [graphene.Node.to_global_id("Warehouse", second_warehouse.id)]
+    warehouse_ids = [second_warehouse_id]
 
     variables = {"variantId": variant_id, "warehouseIds": warehouse_ids}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_DELETE_MUTATION,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksDelete"]
 
-    variant.refresh_from_db()
     assert not data["stockErrors"]
-    assert (
-        len(data["productVariant"]["stocks"])
-        == variant.stocks.count()
-        == stocks_count - 1
-    )
+    assert len(data["productVariant"]["stocks"]) == stocks_count - 1
     assert data["productVariant"]["stocks"][0]["quantity"] == 10
     assert data["productVariant"]["stocks"][0]["warehouse"]["slug"] == warehouse.slug
 
 
 def test_product_variant_stocks_delete_mutation_invalid_warehouse_id(
-    staff_api_client, variant, warehouse, permission_manage_products
+    staff_api_client,
+    variant_id,
+    variant,
+    warehouse,
+    second_warehouse_id,
+    permission_manage_products,
 ):
-    variant_id = graphene.Node.to_global_id("ProductVariant", variant.pk)
-    second_warehouse = Warehouse.objects.get(pk=warehouse.pk)
-    second_warehouse.slug = "second warehouse"
-    second_warehouse.pk = None
-    second_warehouse.save()
-
-    Stock.objects.bulk_create(
+    stocks = Stock.objects.bulk_create(
         [Stock(product_variant=variant, warehouse=warehouse, quantity=10)]
     )
-    stocks_count = variant.stocks.count()
+    stocks_count = len(stocks)
 
-    warehouse_ids = [graphene.Node.to_global_id("Warehouse", second_warehouse.id)]
+    warehouse_ids = [second_warehouse_id]
 
     variables = {"variantId": variant_id, "warehouseIds": warehouse_ids}
-    response = staff_api_client.post_graphql(
+    content = staff_api_client.execute_graphql(
         VARIANT_STOCKS_DELETE_MUTATION,
         variables,
         permissions=[permission_manage_products],
     )
-    content = get_graphql_content(response)
     data = content["data"]["productVariantStocksDelete"]
 
-    variant.refresh_from_db()
     assert not data["stockErrors"]
-    assert (
-        len(data["productVariant"]["stocks"]) == variant.stocks.count() == stocks_count
-    )
+    assert len(data["productVariant"]["stocks"]) == stocks_count
     assert data["productVariant"]["stocks"][0]["quantity"] == 10
     assert data["productVariant"]["stocks"][0]["warehouse"]["slug"] == warehouse.slug
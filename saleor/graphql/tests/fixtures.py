@@ -1,18 +1,33 @@
 import json
 import logging
+from functools import lru_cache, partial
 
 import graphene
 import pytest
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.wsgi import WSGIRequest
 from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import reverse
 from django.test.client import MULTIPART_CONTENT, Client
+from django.utils.module_loading import import_string
+from graphql import execute, parse, validate
+from graphql.backend import (
+    GraphQLCachedBackend,
+    GraphQLCoreBackend,
+    GraphQLDocument,
+    get_default_backend,
+    set_default_backend,
+)
+from graphql.execution import ExecutionResult
 
 from ...account.models import User
 from ...core.jwt import create_access_token
 from ...tests.utils import flush_post_commit_hooks
-from ..views import handled_errors_logger, unhandled_errors_logger
-from .utils import assert_no_permission
+from ..api import schema
+from ..views import GraphQLView, handled_errors_logger, unhandled_errors_logger
+from .utils import assert_no_permission, assert_no_permission_in_content
 
 API_PATH = reverse("api")
 ACCESS_CONTROL_ALLOW_ORIGIN = "Access-Control-Allow-Origin"
@@ -20,6 +35,41 @@ ACCESS_CONTROL_ALLOW_CREDENTIALS = "Access-Control-Allow-Credentials"
 ACCESS_CONTROL_ALLOW_HEADERS = "Access-Control-Allow-Headers"
 ACCESS_CONTROL_ALLOW_METHODS = "Access-Control-Allow-Methods"
 
+# Middleware from `settings.MIDDLEWARE` that only act on the response and are
+# skipped for requests executed directly against the schema.
+RESPONSE_MIDDLEWARE = {
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "saleor.core.middleware.jwt_refresh_token_middleware",
+}
+
+
+def _apply_request_middleware(request):
+    """Run the request through the annotating middleware from the settings."""
+
+    def get_response(request):
+        return request
+
+    for middleware_path in reversed(settings.MIDDLEWARE):
+        if middleware_path in RESPONSE_MIDDLEWARE:
+            continue
+        try:
+            get_response = import_string(middleware_path)(get_response)
+        except MiddlewareNotUsed:
+            continue
+    return get_response(request)
+
+
+@lru_cache(maxsize=None)
+def _get_graphql_view(backend):
+    """Return the API view executing queries with the given backend.
+
+    The view only holds the schema, the backend and the instantiated Graphene
+    middleware, so a single instance is shared by all the requests executed
+    directly against the schema instead of setting it up on every call.
+    """
+    return GraphQLView(schema=schema, backend=backend)
+
 
 class ApiClient(Client):
     """GraphQL API client."""
@@ -101,6 +151,50 @@ class ApiClient(Client):
         flush_post_commit_hooks()
         return result
 
+    def execute_graphql(
+        self,
+        query,
+        variables=None,
+        permissions=None,
+        check_no_permissions=True,
+        *,
+        ignore_errors: bool = False,
+    ):
+        """Execute a GraphQL query directly against the schema.
+
+        Unlike `post_graphql` it doesn't go through the Django request handler,
+        URL resolving and JSON encoding of the request and response. Use it in
+        tests that only assert on the response content, which is returned as
+        a dict and checked for errors the same way as in `get_graphql_content`.
+        """
+        data = {"query": query}
+        if variables is not None:
+            data["variables"] = variables
+
+        if permissions:
+            if check_no_permissions:
+                assert_no_permission_in_content(self._execute_graphql(data))
+            if self.app:
+                self.app.permissions.add(*permissions)
+            else:
+                self.user.user_permissions.add(*permissions)
+        content = self._execute_graphql(data)
+        flush_post_commit_hooks()
+        if not ignore_errors:
+            assert "errors" not in content, content["errors"]
+        return content
+
+    def _execute_graphql(self, data):
+        request = WSGIRequest(
+            self._base_environ(PATH_INFO=API_PATH, REQUEST_METHOD="POST")
+        )
+
+        request = _apply_request_middleware(request)
+
+        view = _get_graphql_view(get_default_backend())
+        content, _status_code = view.get_response(request, data)
+        return content
+
     def post_multipart(self, *args, permissions=None, **kwargs):
         """Send a multipart POST request.
 
@@ -141,6 +235,49 @@ def api_client():
     return ApiClient(user=AnonymousUser())
 
 
+class ValidatedDocumentBackend(GraphQLCoreBackend):
+    """Backend validating documents once, when they are parsed.
+
+    The core backend validates the document against the schema on every
+    execution. Combined with `GraphQLCachedBackend`, documents returned by this
+    backend are both parsed and validated only once.
+    """
+
+    def document_from_string(self, schema, document_string):
+        document_ast = parse(document_string)
+        validation_errors = validate(schema, document_ast)
+        if validation_errors:
+            result = ExecutionResult(errors=validation_errors, invalid=True)
+
+            def execute_document(*_args, **_kwargs):
+                return result
+
+        else:
+            execute_document = partial(
+                execute, schema, document_ast, **self.execute_params
+            )
+        return GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=execute_document,
+        )
+
+
+@pytest.fixture(scope="module")
+def graphql_cached_backend():
+    """Parse and validate each distinct GraphQL document once per test module.
+
+    The API view picks the default backend for every request, so while this
+    fixture is active, repeated requests with the same query string reuse the
+    document parsed and validated by the first one.
+    """
+    default_backend = get_default_backend()
+    set_default_backend(GraphQLCachedBackend(ValidatedDocumentBackend()))
+    yield
+    set_default_backend(default_backend)
+
+
 @pytest.fixture
 def schema_context():
     params = {"user": AnonymousUser()}
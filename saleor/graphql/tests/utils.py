@@ -1,8 +1,20 @@
 import json
+from functools import lru_cache
 
+import graphene
 from django.core.serializers.json import DjangoJSONEncoder
 
 
+@lru_cache(maxsize=1024)
+def to_global_id(type_name: str, pk) -> str:
+    """Return the global ID of an object, caching the result.
+
+    Global IDs depend only on the type name and the primary key, so tests
+    referencing the same object several times encode it only once.
+    """
+    return graphene.Node.to_global_id(type_name, pk)
+
+
 def get_graphql_content_from_response(response):
     return json.loads(response.content.decode("utf8"))
 
@@ -20,6 +32,10 @@ def get_graphql_content(response, *, ignore_errors: bool = False):
 
 def assert_no_permission(response):
     content = get_graphql_content_from_response(response)
+    assert_no_permission_in_content(content)
+
+
+def assert_no_permission_in_content(content):
     assert "errors" in content, content
     assert content["errors"][0]["message"] == (
         "You do not have permission to perform this action"